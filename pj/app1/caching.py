@@ -0,0 +1,163 @@
+import functools
+import hashlib
+import os
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import CSVFile, AnalysisSession, Chart
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def content_hash(source):
+    """SHA-256 of a path or file object, read in chunks; file objects are rewound."""
+    digest = hashlib.sha256()
+    if hasattr(source, 'read'):
+        source.seek(0)
+        for chunk in iter(lambda: source.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+        source.seek(0)
+    else:
+        with open(source, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(HASH_CHUNK_BYTES), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ensure_content_hash(csv_file):
+    """Hash files uploaded before ``content_hash`` existed, once."""
+    if not csv_file.content_hash:
+        csv_file.content_hash = content_hash(csv_file.file.path)
+        csv_file.save(update_fields=['content_hash'])
+    return csv_file.content_hash
+
+
+def make_etag(*parts):
+    return hashlib.sha256('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+def _user_file(request, file_id):
+    try:
+        file_id = int(file_id)
+    except (TypeError, ValueError):
+        return None
+    return CSVFile.objects.filter(id=file_id, user=request.user).first()
+
+
+def _user_session(request, session_id):
+    return AnalysisSession.objects.filter(id=session_id, user=request.user).select_related('csv_file').first()
+
+
+def _page_parts(request):
+    # Rendered pages embed a CSRF token, so tie them to the visitor's CSRF cookie.
+    return (request.user.id, request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''))
+
+
+def _or_none(func):
+    """Bad ids or a missing stored file disable the check instead of raising."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except (TypeError, ValueError, OSError):
+            return None
+    return wrapper
+
+
+# The functions below follow the ``(request, *args, **kwargs)`` signature of
+# django.views.decorators.http.condition. Returning None disables the check,
+# leaving the view to produce its usual 404/error response.
+
+@_or_none
+def columns_etag(request, file_id):
+    csv_file = _user_file(request, file_id)
+    if csv_file is None:
+        return None
+    return make_etag('columns', ensure_content_hash(csv_file))
+
+
+@_or_none
+def columns_last_modified(request, file_id):
+    csv_file = _user_file(request, file_id)
+    return csv_file.uploaded_at if csv_file else None
+
+
+@_or_none
+def column_data_etag(request):
+    csv_file = _user_file(request, request.GET.get('file_id'))
+    if csv_file is None:
+        return None
+    return make_etag('column_data', ensure_content_hash(csv_file), request.GET.get('column', ''))
+
+
+@_or_none
+def column_data_last_modified(request):
+    csv_file = _user_file(request, request.GET.get('file_id'))
+    return csv_file.uploaded_at if csv_file else None
+
+
+@_or_none
+def file_last_modified(request, file_id):
+    """The stored file's mtime, which moves when rows are appended in place."""
+    csv_file = _user_file(request, file_id)
+    if csv_file is None:
+        return None
+    modified = datetime.fromtimestamp(os.path.getmtime(csv_file.file.path), tz=timezone.utc)
+    return max(modified, csv_file.uploaded_at)
+
+
+@_or_none
+def summary_etag(request, file_id):
+    csv_file = _user_file(request, file_id)
+    if csv_file is None:
+        return None
+    # Size is included so rows appended in place invalidate the cached summary.
+    return make_etag(
+        'summary', ensure_content_hash(csv_file), os.path.getsize(csv_file.file.path),
+        request.GET.get('method', 'pearson'), request.GET.get('top_k', '')
+    )
+
+
+@_or_none
+def timeseries_etag(request, file_id):
+    csv_file = _user_file(request, file_id)
+    if csv_file is None:
+        return None
+    params = [request.GET.get(k, '') for k in ('column', 'granularity', 'y_column', 'agg', 'max_buckets')]
+    return make_etag('timeseries', ensure_content_hash(csv_file), os.path.getsize(csv_file.file.path), *params)
+
+
+@_or_none
+def analyze_etag(request, session_id):
+    session = _user_session(request, session_id)
+    if session is None:
+        return None
+    return make_etag('analyze', session.id, ensure_content_hash(session.csv_file), *_page_parts(request))
+
+
+@_or_none
+def analyze_last_modified(request, session_id):
+    session = _user_session(request, session_id)
+    return session.csv_file.uploaded_at if session else None
+
+
+def _chart_state(session):
+    return Chart.objects.filter(session=session).aggregate(count=Count('id'), latest=Max('created_at'))
+
+
+# The dashboard has no Last-Modified: deleting an older chart changes the page
+# without moving any timestamp, so the ETag (chart count included) is the only
+# correct validator.
+@_or_none
+def dashboard_etag(request, session_id):
+    session = _user_session(request, session_id)
+    if session is None:
+        return None
+    state = _chart_state(session)
+    return make_etag(
+        'dashboard', session.id, ensure_content_hash(session.csv_file),
+        state['count'], state['latest'], *_page_parts(request)
+    )
+
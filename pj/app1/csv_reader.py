@@ -0,0 +1,181 @@
+import csv
+import importlib.util
+import io
+
+import chardet
+import pandas as pd
+from pandas._libs.parsers import STR_NA_VALUES
+
+SNIFF_BYTES = 64 * 1024
+SNIFF_DELIMITERS = ',;\t|'
+
+# The only read_csv option the pyarrow path handles; anything else forces the C engine.
+PYARROW_OPTIONS = {'usecols'}
+
+# A strptime format no cell can match, so pyarrow leaves timestamp text as strings.
+_NO_TIMESTAMPS = '\x01never\x01%Y'
+
+# pandas' boolean spellings; pyarrow would also accept 0/1.
+_TRUE_VALUES = ['True', 'TRUE', 'true']
+_FALSE_VALUES = ['False', 'FALSE', 'false']
+
+DEFAULT_DIALECT = {'encoding': 'utf-8', 'delimiter': ',', 'quotechar': '"'}
+
+
+def pyarrow_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def best_engine():
+    return 'pyarrow' if pyarrow_available() else 'c'
+
+
+def _read_sample(source, size):
+    if hasattr(source, 'read'):
+        pos = source.tell() if hasattr(source, 'tell') else 0
+        sample = source.read(size)
+        source.seek(pos)
+        return sample
+    with open(source, 'rb') as fh:
+        return fh.read(size)
+
+
+def _detect_encoding(sample, truncated):
+    if sample.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    try:
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the sample boundary is still UTF-8;
+        # at the real end of the file the same bytes are simply invalid.
+        if truncated and e.reason == 'unexpected end of data':
+            return 'utf-8'
+    detected = chardet.detect(sample).get('encoding')
+    if not detected:
+        # latin-1 maps every byte, so the parse never fails outright.
+        return 'latin-1'
+    return detected.lower()
+
+
+def sniff_dialect(source, sample_size=SNIFF_BYTES):
+    """Guess encoding, delimiter and quote character from the head of a CSV.
+
+    ``source`` is a path or a seekable binary file object; the file position is
+    left untouched.
+    """
+    sample = _read_sample(source, sample_size)
+    if isinstance(sample, str):
+        sample = sample.encode('utf-8')
+    if not sample:
+        return dict(DEFAULT_DIALECT)
+
+    encoding = _detect_encoding(sample, truncated=len(sample) >= sample_size)
+    text = sample.decode(encoding, errors='ignore')
+    # Drop the trailing partial line so the sniffer sees whole records only.
+    if len(sample) >= sample_size and '\n' in text:
+        text = text[:text.rfind('\n')]
+
+    try:
+        sniffed = csv.Sniffer().sniff(text, delimiters=SNIFF_DELIMITERS)
+        delimiter, quotechar = sniffed.delimiter, sniffed.quotechar or '"'
+    except csv.Error:
+        delimiter, quotechar = ',', '"'
+
+    return {'encoding': encoding, 'delimiter': delimiter, 'quotechar': quotechar}
+
+
+def _header(source, options):
+    """Column names exactly as the C engine would label them (``a.1``, ``Unnamed: 0``)."""
+    start = source.tell() if hasattr(source, 'tell') else None
+    names = list(pd.read_csv(source, engine='c', nrows=0, **options).columns)
+    if start is not None:
+        source.seek(start)
+    return names
+
+
+def _read_pyarrow(source, options, usecols=None):
+    """Multithreaded pyarrow parse that returns what the C engine would.
+
+    Header names come from the C engine so duplicates and blanks are renamed
+    the pandas way, pandas' NA markers become nulls in every column, and
+    inferred dates, timestamps and times are cast back to their text.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    header = _header(source, options)
+    if usecols is not None:
+        # pandas keeps usecols in file order; include_columns keeps request order.
+        wanted = set(usecols)
+        usecols = [name for name in header if name in wanted]
+
+    table = pa_csv.read_csv(
+        source,
+        read_options=pa_csv.ReadOptions(encoding=options['encoding'], column_names=header, skip_rows=1),
+        parse_options=pa_csv.ParseOptions(delimiter=options['sep'], quote_char=options['quotechar']),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=usecols,
+            timestamp_parsers=[_NO_TIMESTAMPS],
+            null_values=sorted(STR_NA_VALUES),
+            strings_can_be_null=True,
+            true_values=_TRUE_VALUES,
+            false_values=_FALSE_VALUES,
+        ),
+    )
+    for i, field in enumerate(table.schema):
+        if pa.types.is_binary(field.type):
+            # Bytes that did not decode; let the C engine raise a proper error.
+            raise ValueError(f'Column {field.name!r} is not valid {options["encoding"]}')
+        if pa.types.is_temporal(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.string()))
+        elif pa.types.is_null(field.type):
+            # An all-empty column; the C engine reads it as float NaN.
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+    return table.to_pandas()
+
+
+def read_csv(source, dialect=None, engine=None, **kwargs):
+    """Read a CSV with the fastest available engine.
+
+    ``dialect`` is the dict returned by :func:`sniff_dialect` (usually the one
+    stored on ``CSVFile.dialect``); when omitted the file is sniffed first.
+    The multithreaded pyarrow engine is used when installed and ``kwargs``
+    only select columns, otherwise pandas' C engine. Both return the same
+    dtypes: date-like text stays text.
+    """
+    if not dialect:
+        dialect = sniff_dialect(source)
+
+    options = {
+        'sep': dialect.get('delimiter', ','),
+        'quotechar': dialect.get('quotechar', '"'),
+        'encoding': dialect.get('encoding', 'utf-8'),
+    }
+
+    if engine is None:
+        engine = best_engine()
+        if set(kwargs) - PYARROW_OPTIONS:
+            engine = 'c'
+
+    start = source.tell() if hasattr(source, 'tell') else None
+    if engine == 'pyarrow':
+        try:
+            return _read_pyarrow(source, options, **kwargs)
+        except Exception:
+            # pyarrow is stricter (ragged rows, odd quoting); retry with the C engine.
+            if start is not None:
+                source.seek(start)
+            engine = 'c'
+
+    options.update(kwargs)
+    return pd.read_csv(source, engine=engine, **options)
+
+
+def read_csv_file(csv_file, **kwargs):
+    """Read a stored ``CSVFile``, sniffing and saving its dialect on first use."""
+    path = csv_file.file.path
+    if not csv_file.dialect:
+        csv_file.dialect = sniff_dialect(path)
+        csv_file.save(update_fields=['dialect'])
+    return read_csv(path, dialect=csv_file.dialect, **kwargs)
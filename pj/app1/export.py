@@ -0,0 +1,194 @@
+import csv
+import io
+import json
+
+import pandas as pd
+
+from .csv_reader import read_csv_file
+
+EXPORT_CHUNK_ROWS = 50_000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def chart_points(chart):
+    """Return ``(labels, values)`` for a chart, recomputing them if the saved config has none."""
+    config = chart.config or {}
+    labels, values = config.get('labels'), config.get('data')
+    if labels is not None and values is not None:
+        return list(labels), list(values)
+
+    df = read_csv_file(chart.session.csv_file, usecols=[chart.x_column])
+    counts = df[chart.x_column].value_counts(dropna=True)
+    return [str(label) for label in counts.index], [int(count) for count in counts]
+
+
+def chart_payload(chart):
+    labels, values = chart_points(chart)
+    return {
+        'id': chart.id,
+        'title': chart.title,
+        'chart_type': chart.chart_type,
+        'x_column': chart.x_column,
+        'y_column': chart.y_column,
+        'created_at': chart.created_at.isoformat(),
+        'labels': labels,
+        'data': values,
+    }
+
+
+def _csv_line(values):
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator='\n').writerow(values)
+    return buf.getvalue()
+
+
+def stream_chart(chart, fmt):
+    labels, values = chart_points(chart)
+    if fmt == 'csv':
+        yield _csv_line([chart.x_column, 'value'])
+        for label, value in zip(labels, values):
+            yield _csv_line([label, value])
+    else:
+        for label, value in zip(labels, values):
+            yield json.dumps({'label': label, 'value': value}) + '\n'
+
+
+def stream_session(charts, fmt):
+    """One chart per record: a JSON line per chart, or a CSV row per data point."""
+    if fmt == 'csv':
+        yield _csv_line(['chart_id', 'title', 'chart_type', 'x_column', 'label', 'value'])
+    for chart in charts.iterator():
+        payload = chart_payload(chart)
+        if fmt == 'csv':
+            for label, value in zip(payload['labels'], payload['data']):
+                yield _csv_line([chart.id, chart.title, chart.chart_type, chart.x_column, label, value])
+        else:
+            yield json.dumps(payload) + '\n'
+
+
+def file_columns(csv_file):
+    """The stored file's header as the readers label it (``a.1``, ``Unnamed: 0``)."""
+    return list(read_csv_file(csv_file, nrows=0).columns)
+
+
+def iter_row_chunks(csv_file, columns=None, offset=0, limit=None, where=None, dtype=str, keep_default_na=False):
+    """Yield DataFrame chunks of a stored CSV, filtered and sliced on the fly.
+
+    By default every cell is read as its original text, so exported values
+    are exactly the uploaded ones (``007`` stays ``007``, blanks stay blank).
+    ``where`` is an optional ``(column, value)`` equality filter. A float
+    value is compared numerically; any other value is compared with the
+    column read as text. Only one chunk is held in memory at a time, and
+    reading stops as soon as ``limit`` rows have been produced.
+    """
+    usecols = None
+    if columns:
+        usecols = list(columns)
+        if where and where[0] not in usecols:
+            usecols.append(where[0])
+
+    if where and not isinstance(where[1], float) and isinstance(dtype, dict):
+        dtype = dict(dtype, **{where[0]: str})
+
+    remaining = limit
+    with read_csv_file(csv_file, usecols=usecols, dtype=dtype, keep_default_na=keep_default_na,
+                       chunksize=EXPORT_CHUNK_ROWS) as reader:
+        for chunk in reader:
+            if where:
+                column, value = where
+                if isinstance(value, float):
+                    chunk = chunk[pd.to_numeric(chunk[column], errors='coerce') == value]
+                else:
+                    chunk = chunk[chunk[column] == value]
+            if offset:
+                skipped = min(offset, len(chunk))
+                chunk = chunk.iloc[skipped:]
+                offset -= skipped
+            if remaining is not None:
+                chunk = chunk.iloc[:remaining]
+                remaining -= len(chunk)
+            if columns:
+                chunk = chunk[list(columns)]
+            if len(chunk):
+                yield chunk
+            if remaining == 0:
+                break
+
+
+def stream_rows_csv(chunks, columns):
+    # The header goes out before the first chunk is read, so a sparse filter
+    # still gets its first byte immediately (and an empty result is valid CSV).
+    yield _csv_line(columns)
+    for chunk in chunks:
+        yield chunk.to_csv(header=False, index=False)
+
+
+def stream_rows_jsonl(chunks):
+    for chunk in chunks:
+        yield chunk.to_json(orient='records', lines=True, date_format='iso').rstrip('\n') + '\n'
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def parquet_schema(csv_file, columns):
+    """Float columns for ``numeric`` types, strings otherwise, named after the real header."""
+    import pyarrow as pa
+
+    names = columns
+    return pa.schema([
+        (name, pa.float64() if csv_file.column_types.get(name) == 'numeric' else pa.string())
+        for name in names
+    ])
+
+
+def parquet_dtypes(schema):
+    """pandas dtypes matching :func:`parquet_schema`, so every chunk converts identically."""
+    import pyarrow as pa
+    return {field.name: 'float64' if field.type == pa.float64() else str for field in schema}
+
+
+def stream_rows_parquet(chunks, schema):
+    """Emit each chunk as its own row group, flushing bytes as soon as they are written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    # The leading magic bytes are already written; send them before reading.
+    yield sink.drain()
+    try:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
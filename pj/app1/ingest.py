@@ -0,0 +1,296 @@
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+import pandas as pd
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+from .caching import HASH_CHUNK_BYTES, content_hash
+from .csv_reader import DEFAULT_DIALECT, read_csv, read_csv_file, sniff_dialect
+from .models import CSVFile, AnalysisSession
+
+MERGE_CHUNK_ROWS = 100_000
+
+
+def infer_column_types(df):
+    column_types = {}
+    for col in df.columns:
+        dtype = str(df[col].dtype)
+        if 'int' in dtype or 'float' in dtype:
+            column_types[col] = 'numeric'
+        elif 'object' in dtype:
+            try:
+                pd.to_datetime(df[col], errors='raise')
+                column_types[col] = 'datetime'
+            except:
+                unique_count = df[col].nunique()
+                if unique_count < 20:
+                    column_types[col] = 'categorical'
+                else:
+                    column_types[col] = 'text'
+        elif 'datetime' in dtype:
+            column_types[col] = 'datetime'
+        else:
+            column_types[col] = 'text'
+    return column_types
+
+
+def parse_upload(uploaded):
+    """Sniff and parse an uploaded file, leaving it rewound for saving."""
+    dialect = sniff_dialect(uploaded)
+    df = read_csv(uploaded, dialect=dialect)
+    uploaded.seek(0)
+    return df, dialect
+
+
+def save_upload(user, uploaded):
+    fs = FileSystemStorage()
+    return fs.save(f'csv_files/{user.id}/{uploaded.name}', uploaded)
+
+
+def create_records(user, name, filename, size, rows, columns, column_types, dialect, file_hash=''):
+    csv_record = CSVFile.objects.create(
+        user=user,
+        name=name,
+        original_filename=name,
+        file=filename,
+        size=size,
+        rows=rows,
+        columns=columns,
+        column_types=column_types,
+        dialect=dialect,
+        content_hash=file_hash
+    )
+    session = AnalysisSession.objects.create(
+        csv_file=csv_record,
+        user=user
+    )
+    return csv_record, session
+
+
+def expand_uploads(uploads, archives):
+    """Yield ``(name, loader)`` for every CSV among the uploads.
+
+    Zip archives are opened through ``archives`` (an ``ExitStack`` the caller
+    closes once the workers are done) and each ``.csv`` member becomes its own
+    entry; an archive that cannot be opened becomes a single failing entry.
+    ``loader`` returns a file object and is called on a worker thread
+    so members are only decompressed while they are being ingested.
+    """
+    max_size = getattr(settings, 'MAX_UPLOAD_SIZE', None)
+    for uploaded in uploads:
+        if not uploaded.name.lower().endswith('.zip'):
+            if max_size and uploaded.size > max_size:
+                yield uploaded.name, _too_large(uploaded.name, max_size)
+            else:
+                yield uploaded.name, (lambda f=uploaded: f)
+            continue
+
+        try:
+            archive = archives.enter_context(zipfile.ZipFile(uploaded))
+        except zipfile.BadZipFile as e:
+            yield uploaded.name, _failing(f'{uploaded.name} is not a valid zip archive: {e}')
+            continue
+        for info in archive.infolist():
+            basename = os.path.basename(info.filename)
+            if info.is_dir() or info.filename.startswith('__MACOSX/') or not basename.lower().endswith('.csv'):
+                continue
+            # The header size is only a hint from the uploader; _read_member enforces the cap.
+            if max_size and info.file_size > max_size:
+                yield basename, _too_large(basename, max_size)
+                continue
+            yield basename, (lambda a=archive, i=info, n=basename: _read_member(a, i, n, max_size))
+
+
+def _read_member(archive, info, name, max_size):
+    with archive.open(info) as member:
+        data = member.read(max_size + 1) if max_size else member.read()
+    if max_size and len(data) > max_size:
+        _too_large(name, max_size)()
+    return ContentFile(data, name=name)
+
+
+def _failing(message):
+    def loader():
+        raise ValueError(message)
+    return loader
+
+
+def _too_large(name, max_size):
+    return _failing(f'{name} exceeds the {max_size // (1024 * 1024)} MB limit')
+
+
+def _ingest_one(user, name, loader):
+    """Worker: parse and store one file. Database writes stay on the caller's thread."""
+    try:
+        uploaded = loader()
+        df, dialect = parse_upload(uploaded)
+        file_hash = content_hash(uploaded)
+        filename = save_upload(user, uploaded)
+        return {
+            'filename': name,
+            'success': True,
+            'stored_as': filename,
+            'size': uploaded.size,
+            'rows': len(df),
+            'columns_list': list(df.columns),
+            'column_types': infer_column_types(df),
+            'dialect': dialect,
+            'file_hash': file_hash,
+        }
+    except Exception as e:
+        return {'filename': name, 'success': False, 'error': str(e)}
+
+
+def ingest_many(user, uploads, workers=None):
+    """Parse and store many CSVs concurrently through a bounded thread pool.
+
+    Returns one status dict per CSV, in upload order. Parsing and file writes
+    run on the pool; ``CSVFile``/``AnalysisSession`` rows are created here.
+    """
+    workers = workers or getattr(settings, 'BULK_UPLOAD_WORKERS', 4)
+    with ExitStack() as archives:
+        entries = list(expand_uploads(uploads, archives))
+        if not entries:
+            return []
+        with ThreadPoolExecutor(max_workers=min(workers, len(entries))) as pool:
+            results = list(pool.map(lambda entry: _ingest_one(user, *entry), entries))
+
+    for result in results:
+        if not result['success']:
+            continue
+        csv_record, session = create_records(
+            user,
+            result['filename'],
+            result.pop('stored_as'),
+            result.pop('size'),
+            result['rows'],
+            len(result['columns_list']),
+            result['column_types'],
+            result.pop('dialect'),
+            result.pop('file_hash'),
+        )
+        result['file_id'] = csv_record.id
+        result['session_id'] = session.id
+    return results
+
+
+def _merge_column_types(records):
+    merged = {}
+    for record in records:
+        for col, col_type in record.column_types.items():
+            if merged.setdefault(col, col_type) != col_type:
+                merged[col] = 'text'
+    return merged
+
+
+def _byte_compatible(records):
+    """Whether members can be concatenated as raw bytes: one dialect, ASCII-compatible encoding."""
+    dialect = records[0].dialect
+    if not dialect or any(record.dialect != dialect for record in records):
+        return False
+    quote = dialect.get('quotechar', '"')
+    return f'\n{quote}'.encode(dialect.get('encoding', 'utf-8')).endswith(f'\n{quote}'.encode('ascii'))
+
+
+def _skip_header(fh, quote):
+    """Advance past the header record, including any quoted line breaks in it."""
+    quotes = 0
+    for line in fh:
+        quotes += line.count(quote)
+        if quotes % 2 == 0:
+            return
+
+
+def _append_bytes(out, records):
+    tail = b'\n'
+    for index, record in enumerate(records):
+        with open(record.file.path, 'rb') as fh:
+            if index:
+                _skip_header(fh, record.dialect.get('quotechar', '"').encode('ascii'))
+                if not tail.endswith(b'\n'):
+                    out.write(b'\n')
+            for block in iter(lambda: fh.read(HASH_CHUNK_BYTES), b''):
+                out.write(block)
+                tail = block
+
+
+def _append_text(out, records):
+    """Re-encode members as UTF-8 CSV, keeping every cell's original text."""
+    rows = 0
+    header = True
+    text = io.TextIOWrapper(out, encoding='utf-8', newline='')
+    for record in records:
+        with read_csv_file(record, dtype=str, keep_default_na=False, chunksize=MERGE_CHUNK_ROWS) as reader:
+            for chunk in reader:
+                chunk.to_csv(text, header=header, index=False)
+                header = False
+                rows += len(chunk)
+    # Flush and hand ``out`` back to the caller, who closes it.
+    text.detach()
+    return rows
+
+
+def merge_csv_files(user, records, name):
+    """Stream same-schema ``CSVFile`` records into one stored CSV.
+
+    Members sharing a dialect are concatenated byte for byte, dropping every
+    header after the first. Otherwise they are read chunk by chunk as text and
+    rewritten as UTF-8, so values are never reinterpreted either way and the
+    merged dataset is never held in memory as a whole.
+    """
+    fs = FileSystemStorage()
+    filename = fs.get_available_name(f'csv_files/{user.id}/{name}')
+    path = fs.path(filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'wb') as out:
+        if _byte_compatible(records):
+            _append_bytes(out, records)
+            rows = sum(record.rows for record in records)
+            dialect = dict(records[0].dialect)
+        else:
+            rows = _append_text(out, records)
+            dialect = dict(DEFAULT_DIALECT)
+
+    columns = len(records[0].column_types)
+    return create_records(
+        user,
+        name,
+        filename,
+        os.path.getsize(path),
+        rows,
+        columns,
+        _merge_column_types(records),
+        dialect,
+        content_hash(path),
+    )
+
+
+def merge_same_schema(user, results):
+    """Merge every group of two or more ingested files sharing a header."""
+    groups = {}
+    for result in results:
+        if result['success']:
+            groups.setdefault(tuple(result['columns_list']), []).append(result['file_id'])
+
+    merged = []
+    for file_ids in groups.values():
+        if len(file_ids) < 2:
+            continue
+        records = list(CSVFile.objects.filter(id__in=file_ids, user=user))
+        records.sort(key=lambda r: file_ids.index(r.id))
+        stem = os.path.splitext(records[0].name)[0]
+        csv_record, session = merge_csv_files(user, records, f'{stem}_merged_{len(records)}.csv')
+        merged.append({
+            'file_id': csv_record.id,
+            'session_id': session.id,
+            'filename': csv_record.name,
+            'rows': csv_record.rows,
+            'member_file_ids': file_ids,
+        })
+    return merged
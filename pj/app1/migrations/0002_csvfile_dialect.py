@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='dialect',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
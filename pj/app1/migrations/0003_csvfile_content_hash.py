@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0002_csvfile_dialect'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
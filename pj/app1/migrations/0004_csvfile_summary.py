@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0003_csvfile_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvfile',
+            name='summary',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
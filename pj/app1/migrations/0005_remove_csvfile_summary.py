@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0004_csvfile_summary'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='csvfile',
+            name='summary',
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 
 class CSVFile(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -12,6 +14,8 @@ class CSVFile(models.Model):
     rows = models.IntegerField(default=0)
     columns = models.IntegerField(default=0)
     column_types = models.JSONField(default=dict)
+    dialect = models.JSONField(default=dict, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
     
     def __str__(self):
         return self.name
@@ -22,6 +26,12 @@ class CSVFile(models.Model):
         super().delete(*args, **kwargs)
         storage.delete(path)
 
+@receiver(post_delete, sender=CSVFile)
+def clear_csv_caches(sender, instance, **kwargs):
+    # A signal rather than delete(): admin bulk actions and user cascades skip Model.delete().
+    from .timeseries import clear_column_cache
+    clear_column_cache(instance)
+
 class AnalysisSession(models.Model):
     csv_file = models.ForeignKey(CSVFile, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -0,0 +1,274 @@
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .caching import content_hash
+from .csv_reader import read_csv, read_csv_file
+from .timeseries import cache_dir
+
+SUMMARY_VERSION = 2
+METHODS = ('pearson', 'spearman')
+
+_MOMENTS = ('count', 'mean', 'm2', 'min', 'max', 'pair_n', 'pair_mean', 'comoment', 'pair_m2')
+_RANKS = ('spearman', 'quartiles')
+
+
+def numeric_columns(csv_file):
+    return [col for col, col_type in csv_file.column_types.items() if col_type == 'numeric']
+
+
+def _clean(values):
+    """NaN/inf are not valid JSON; report them as null."""
+    arr = np.asarray(values, dtype=float)
+    return np.where(np.isfinite(arr), arr, None).tolist()
+
+
+def _to_matrix(df, columns):
+    """Numeric columns as one float64 ``(rows, cols)`` array, non-numbers as NaN."""
+    return np.column_stack([
+        pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64) for col in columns
+    ]) if columns else np.empty((len(df), 0))
+
+
+def _moments(X):
+    """Mergeable statistics for a block of rows.
+
+    Per column (NaN-aware): count, mean, M2, min, max. Per column pair, over
+    the rows where both are present: count, mean of each side, co-moment and
+    M2 of each side, so a sparse column only affects its own pairs. All of it
+    is a few matrix products over the validity mask, and every part combines
+    with Chan's parallel update, so appended rows never require a full re-read.
+    """
+    valid = ~np.isnan(X)
+    count = valid.sum(axis=0)
+    safe = np.where(valid, X, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, safe.sum(axis=0) / count, 0.0)
+    centered = np.where(valid, X - mean, 0.0)
+    m2 = (centered ** 2).sum(axis=0)
+    with np.errstate(invalid='ignore'):
+        col_min = np.where(count > 0, np.nanmin(np.where(valid, X, np.inf), axis=0), np.nan)
+        col_max = np.where(count > 0, np.nanmax(np.where(valid, X, -np.inf), axis=0), np.nan)
+
+    # sums[i, j]: sum of (centered) column i over the rows where j is present too.
+    V = valid.astype(np.float64)
+    pair_n = V.T @ V
+    sums = centered.T @ V
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shift = np.where(pair_n > 0, sums / pair_n, 0.0)
+    comoment = centered.T @ centered - shift * sums.T
+    pair_m2 = (centered ** 2).T @ V - shift * sums
+
+    return {
+        'count': count.astype(np.float64),
+        'mean': mean,
+        'm2': m2,
+        'min': col_min,
+        'max': col_max,
+        'pair_n': pair_n,
+        'pair_mean': shift + mean[:, None],
+        'comoment': comoment,
+        'pair_m2': pair_m2,
+    }
+
+
+def _merge_moments(a, b):
+    out = {}
+
+    na, nb = a['count'], b['count']
+    n = na + nb
+    delta = b['mean'] - a['mean']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out['count'] = n
+        out['mean'] = np.where(n > 0, a['mean'] + delta * nb / n, 0.0)
+        out['m2'] = a['m2'] + b['m2'] + np.where(n > 0, delta ** 2 * na * nb / n, 0.0)
+    out['min'] = np.fmin(a['min'], b['min'])
+    out['max'] = np.fmax(a['max'], b['max'])
+
+    # Same update per pair; delta[i, j] is the shift of column i's mean within pair (i, j).
+    na, nb = a['pair_n'], b['pair_n']
+    n = na + nb
+    delta = b['pair_mean'] - a['pair_mean']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = np.where(n > 0, na * nb / n, 0.0)
+        out['pair_n'] = n
+        out['pair_mean'] = np.where(n > 0, a['pair_mean'] + delta * nb / n, 0.0)
+    out['comoment'] = a['comoment'] + b['comoment'] + delta * delta.T * weight
+    out['pair_m2'] = a['pair_m2'] + b['pair_m2'] + delta ** 2 * weight
+    return out
+
+
+def _rank_stats(X):
+    """Statistics that need every row at once: Spearman matrix and quartiles."""
+    # Pairwise-complete like the Pearson statistics; pandas ranks each pair's rows.
+    spearman = pd.DataFrame(X).corr(method='spearman').to_numpy()
+    with warnings.catch_warnings():
+        # All-NaN columns are expected here and simply yield NaN quartiles.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        quartiles = np.nanpercentile(X, [25, 50, 75], axis=0) if len(X) else np.full((3, X.shape[1]), np.nan)
+    return {'spearman': spearman, 'quartiles': quartiles}
+
+
+def _read_matrix(csv_file, columns):
+    df = read_csv_file(csv_file, usecols=columns)
+    return _to_matrix(df, columns)
+
+
+def _read_appended(csv_file, columns, offset):
+    """Parse only the bytes written after ``offset`` (rows appended since the last summary)."""
+    header = list(csv_file.column_types)
+    with open(csv_file.file.path, 'rb') as fh:
+        fh.seek(offset)
+        df = read_csv(fh, dialect=csv_file.dialect, engine='c', header=None, names=header, usecols=columns)
+    return _to_matrix(df, columns)
+
+
+def _state_path(csv_file):
+    return os.path.join(cache_dir(csv_file), 'summary.npz')
+
+
+def _load_state(csv_file):
+    """The cached summary state, or an empty dict if there is none yet."""
+    path = _state_path(csv_file)
+    if not os.path.exists(path):
+        return {}
+    with np.load(path) as data:
+        state = json.loads(data['meta'].item())
+        state['moments'] = {key: data[key] for key in _MOMENTS}
+        if state.get('ranks'):
+            state['ranks'].update({key: data[key] for key in _RANKS})
+    return state
+
+
+def _save_state(csv_file, state):
+    arrays = dict(state['moments'])
+    meta = {key: value for key, value in state.items() if key not in ('moments', 'ranks')}
+    if state.get('ranks'):
+        meta['ranks'] = {'bytes': state['ranks']['bytes']}
+        arrays.update({key: state['ranks'][key] for key in _RANKS})
+    path = _state_path(csv_file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(tmp, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp, path)
+
+
+def refresh_summary(csv_file, need_ranks=False):
+    """Return the cached summary state, updating it if the file grew or is new.
+
+    The state lives in ``summary.npz`` under the file's column cache rather
+    than on the ``CSVFile`` row, since its pair matrices grow with the square
+    of the column count. Moment statistics are extended with just the
+    appended rows. Rank-based statistics (Spearman, quartiles) cannot be
+    merged, so after an append they are recomputed from the numeric columns
+    the next time Spearman is requested.
+    """
+    columns = numeric_columns(csv_file)
+    size = os.path.getsize(csv_file.file.path)
+    state = _load_state(csv_file)
+
+    fresh = state.get('version') == SUMMARY_VERSION and state.get('columns') == columns
+    changed = False
+    X = None
+
+    if not fresh or size < state.get('bytes', 0):
+        X = _read_matrix(csv_file, columns)
+        state = {'version': SUMMARY_VERSION, 'columns': columns, 'bytes': size,
+                 'rows': int(len(X)), 'moments': _moments(X)}
+        changed = True
+    elif size > state['bytes']:
+        appended = _read_appended(csv_file, columns, state['bytes'])
+        state['moments'] = _merge_moments(state['moments'], _moments(appended))
+        state['rows'] += int(len(appended))
+        state['bytes'] = size
+        csv_file.rows = state['rows']
+        csv_file.size = size
+        csv_file.content_hash = content_hash(csv_file.file.path)
+        csv_file.save(update_fields=['rows', 'size', 'content_hash'])
+        changed = True
+
+    # A full read already has the matrix in memory, so ranks come almost for free.
+    ranks = state.get('ranks')
+    stale = not ranks or ranks.get('bytes') != size
+    if stale and (need_ranks or X is not None):
+        if X is None:
+            X = _read_matrix(csv_file, columns)
+        state['ranks'] = dict(_rank_stats(X), bytes=size)
+        changed = True
+
+    if changed:
+        _save_state(csv_file, state)
+    return state
+
+
+def top_pairs(columns, matrix, counts, k):
+    """The ``k`` column pairs with the largest absolute correlation."""
+    m = np.asarray(matrix, dtype=float)
+    i, j = np.triu_indices(len(columns), k=1)
+    strength = np.abs(m[i, j])
+    strength = np.where(np.isnan(strength), -1.0, strength)
+    k = min(k, len(strength))
+    if k <= 0:
+        return []
+    best = np.argpartition(-strength, k - 1)[:k]
+    best = best[np.argsort(-strength[best])]
+    return [
+        {'x': columns[i[p]], 'y': columns[j[p]], 'correlation': _clean([m[i[p], j[p]]])[0],
+         'n': int(counts[i[p], j[p]])}
+        for p in best
+    ]
+
+
+def build_summary(csv_file, method='pearson', top_k=None):
+    if not numeric_columns(csv_file):
+        return {'columns': [], 'rows': csv_file.rows, 'method': method,
+                'stats': {}, 'correlation': [], 'covariance': [], 'pair_counts': []}
+
+    state = refresh_summary(csv_file, need_ranks=(method == 'spearman'))
+    columns = state['columns']
+    mom = state['moments']
+
+    count = mom['count']
+    pair_n = mom['pair_n']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt(mom['m2'] / (count - 1))
+        # Pairwise-complete, like DataFrame.cov()/corr(): each pair uses the rows where both are present.
+        covariance = np.where(pair_n > 1, mom['comoment'] / (pair_n - 1), np.nan)
+        if method == 'spearman':
+            correlation = state['ranks']['spearman']
+        else:
+            scale = np.sqrt(mom['pair_m2'] * mom['pair_m2'].T)
+            correlation = np.where(pair_n > 1, np.clip(mom['comoment'] / scale, -1.0, 1.0), np.nan)
+
+    stats = {}
+    ranks = state.get('ranks') or {}
+    quartiles = ranks.get('quartiles') if ranks.get('bytes') == state['bytes'] else None
+    for idx, col in enumerate(columns):
+        entry = {
+            'count': int(count[idx]),
+            'missing': int(state['rows'] - count[idx]),
+            'mean': _clean([mom['mean'][idx]])[0] if count[idx] else None,
+            'std': _clean([std[idx]])[0],
+            'min': _clean([mom['min'][idx]])[0],
+            'max': _clean([mom['max'][idx]])[0],
+        }
+        if quartiles is not None:
+            entry['25%'], entry['50%'], entry['75%'] = _clean(quartiles[:, idx])
+        stats[col] = entry
+
+    result = {
+        'columns': columns,
+        'rows': state['rows'],
+        'method': method,
+        'stats': stats,
+    }
+    if top_k:
+        result['top_pairs'] = top_pairs(columns, correlation, pair_n, top_k)
+    else:
+        result['correlation'] = [_clean(row) for row in correlation]
+        result['covariance'] = [_clean(row) for row in covariance]
+        result['pair_counts'] = pair_n.astype(int).tolist()
+    return result
@@ -1,3 +1,355 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .csv_reader import SNIFF_BYTES, pyarrow_available, read_csv, sniff_dialect
+from .export import stream_rows_csv
+from .ingest import _read_member
+from .models import CSVFile
+from .summary import _merge_moments, _moments
+from .timeseries import cache_dir
 
 # Create your tests here.
+
+
+class SniffDialectTests(SimpleTestCase):
+    def test_semicolon_delimiter(self):
+        dialect = sniff_dialect(io.BytesIO(b'a;b\n1;2\n3;4\n'))
+        self.assertEqual(dialect['delimiter'], ';')
+        self.assertEqual(dialect['encoding'], 'utf-8')
+
+    def test_utf8_bom(self):
+        self.assertEqual(sniff_dialect(io.BytesIO(b'\xef\xbb\xbfa,b\n1,2\n'))['encoding'], 'utf-8-sig')
+
+    def test_latin1_byte_at_end_of_whole_file_is_not_utf8(self):
+        dialect = sniff_dialect(io.BytesIO(b'name,val\nfoo,1\nbar,caf\xe9'))
+        self.assertNotEqual(dialect['encoding'], 'utf-8')
+        df = read_csv(io.BytesIO(b'name,val\nfoo,1\nbar,caf\xe9'), dialect=dialect)
+        self.assertEqual(df['val'].tolist(), ['1', 'café'])
+
+    def test_utf8_char_split_by_sample_boundary_is_utf8(self):
+        head = b'a,b\n' + b'x,y\n' * SNIFF_BYTES
+        head = head[:SNIFF_BYTES - 1]
+        body = head + 'é'.encode('utf-8') + b'\n'
+        sample = body[:SNIFF_BYTES]
+        self.assertEqual(len(sample), SNIFF_BYTES)
+        self.assertTrue(sample.endswith(b'\xc3'))
+        self.assertEqual(sniff_dialect(io.BytesIO(body))['encoding'], 'utf-8')
+
+    def test_file_position_is_preserved(self):
+        source = io.BytesIO(b'a,b\n1,2\n')
+        source.seek(2)
+        sniff_dialect(source)
+        self.assertEqual(source.tell(), 2)
+
+
+class ReadCsvEngineTests(SimpleTestCase):
+    DATA = b'day,stamp,n,label\n2024-01-01,2024-01-01T10:00:00,1,x\n,2024-01-02 00:00:00,,y\n'
+
+    def assertEnginesAgree(self, data, **kwargs):
+        if not pyarrow_available():
+            self.skipTest('pyarrow not installed')
+        fast = read_csv(io.BytesIO(data), engine='pyarrow', **kwargs)
+        slow = read_csv(io.BytesIO(data), engine='c', **kwargs)
+        self.assertEqual(fast.dtypes.to_dict(), slow.dtypes.to_dict())
+        self.assertTrue(fast.equals(slow), f'\n{fast}\n!=\n{slow}')
+        return fast
+
+    def test_engines_agree_on_dtypes_and_values(self):
+        self.assertEnginesAgree(self.DATA)
+
+    def test_duplicate_and_blank_headers_are_renamed(self):
+        df = self.assertEnginesAgree(b',a,a,b\n0,1,2,x\n1,3,4,y\n')
+        self.assertEqual(list(df.columns), ['Unnamed: 0', 'a', 'a.1', 'b'])
+        self.assertEnginesAgree(b'a,a,b\n1,2,3\n', usecols=['b', 'a.1'])
+
+    def test_na_markers_are_missing_in_text_columns(self):
+        df = self.assertEnginesAgree(b's,n\nNA,1\nnull,\n,3\nfoo,4\n')
+        self.assertEqual(df['s'].isna().sum(), 3)
+
+    def test_times_stay_text(self):
+        df = self.assertEnginesAgree(b't,n\n10:00:00,1\n11:30:00,2\n')
+        self.assertEqual(df['t'].tolist(), ['10:00:00', '11:30:00'])
+
+    def test_usecols_keeps_file_order(self):
+        df = read_csv(io.BytesIO(self.DATA), usecols=['label', 'day'])
+        self.assertEqual(list(df.columns), ['day', 'label'])
+
+
+class MediaTestCase(TestCase):
+    """Logged-in client with uploads written to a throwaway MEDIA_ROOT."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media)
+        self.settings_override.enable()
+        self.user = User.objects.create_user('tester', password='pw')
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media, ignore_errors=True)
+
+    def upload(self, name, body):
+        return self.client.post('/upload/', {'csv_file': SimpleUploadedFile(name, body)}).json()
+
+
+def make_zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, body in members.items():
+            archive.writestr(name, body)
+    return buf.getvalue()
+
+
+class BulkUploadTests(MediaTestCase):
+    def post(self, files, **data):
+        return self.client.post('/upload/bulk/', {'csv_files': files, **data}).json()
+
+    def test_zip_members_and_loose_files_are_ingested_and_merged(self):
+        archive = make_zip({'m/jan.csv': 'd;v\n1;2\n', 'm/feb.csv': 'd;v\n3;4\n', 'readme.txt': 'hi'})
+        result = self.post([SimpleUploadedFile('mar.csv', b'd,v\n5,6\n'), SimpleUploadedFile('m.zip', archive)], merge='1')
+        self.assertEqual([f['filename'] for f in result['files']], ['mar.csv', 'jan.csv', 'feb.csv'])
+        self.assertTrue(all(f['success'] for f in result['files']))
+        self.assertEqual(result['merged'][0]['rows'], 3)
+
+    def merged_body(self, result):
+        return CSVFile.objects.get(id=result['merged'][0]['file_id']).file.read()
+
+    def test_merge_keeps_values_as_uploaded(self):
+        result = self.post([SimpleUploadedFile('a.csv', b'zip,n\n007,1\n010,'),
+                            SimpleUploadedFile('b.csv', b'zip,n\n020,3\n')], merge='1')
+        self.assertEqual(self.merged_body(result), b'zip,n\n007,1\n010,\n020,3\n')
+        self.assertEqual(result['merged'][0]['rows'], 3)
+
+        result = self.post([SimpleUploadedFile('c.csv', b'zip;n\n007;1\n010;\n'),
+                            SimpleUploadedFile('d.csv', b'zip,n\n020,3\n')], merge='1')
+        self.assertEqual(self.merged_body(result), b'zip,n\n007,1\n010,\n020,3\n')
+
+    @override_settings(MAX_UPLOAD_SIZE=64)
+    def test_size_limit_applies_to_members_and_loose_files(self):
+        big = b'a,b\n' + b'1,2\n' * 40
+        archive = make_zip({'big.csv': big, 'small.csv': b'a,b\n1,2\n'})
+        result = self.post([SimpleUploadedFile('loose.csv', big), SimpleUploadedFile('m.zip', archive)])
+        status = {f['filename']: f['success'] for f in result['files']}
+        self.assertEqual(status, {'loose.csv': False, 'big.csv': False, 'small.csv': True})
+
+    def test_corrupt_zip_fails_on_its_own(self):
+        result = self.post([SimpleUploadedFile('bad.zip', b'not a zip'), SimpleUploadedFile('ok.csv', b'a,b\n1,2\n')])
+        status = {f['filename']: f['success'] for f in result['files']}
+        self.assertEqual(status, {'bad.zip': False, 'ok.csv': True})
+
+    def test_member_read_is_capped_regardless_of_header(self):
+        with zipfile.ZipFile(io.BytesIO(make_zip({'big.csv': b'x' * 100}))) as archive:
+            info = archive.getinfo('big.csv')
+            with self.assertRaises(ValueError):
+                _read_member(archive, info, 'big.csv', max_size=10)
+
+
+class ExportRowsTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        body = 'k,name\n' + ''.join(f'{i % 5},{"n" + str(i % 3)}\n' for i in range(30))
+        self.file_id = self.upload('rows.csv', body.encode())['file_id']
+
+    def export(self, query):
+        response = self.client.get(f'/export/file/{self.file_id}/?{query}')
+        return response, b''.join(response.streaming_content).decode() if response.streaming else None
+
+    def test_numeric_filter_matches_by_value(self):
+        for value in ('3', '3.0'):
+            _, body = self.export(f'filter_column=k&filter_value={value}')
+            lines = body.splitlines()
+            self.assertEqual(lines[0], 'k,name')
+            self.assertEqual(len(lines), 1 + 6)
+
+    def test_text_filter(self):
+        _, body = self.export('filter_column=name&filter_value=n1&columns=k')
+        self.assertEqual(len(body.splitlines()), 1 + 10)
+
+    def test_no_match_still_sends_header(self):
+        _, body = self.export('filter_column=k&filter_value=99')
+        self.assertEqual(body, 'k,name\n')
+
+    def test_values_are_exported_as_uploaded(self):
+        file_id = self.upload('z.csv', b'zip,n\n007,1\n010,\n')['file_id']
+        response = self.client.get(f'/export/file/{file_id}/')
+        self.assertEqual(b''.join(response.streaming_content), b'zip,n\n007,1\n010,\n')
+        response = self.client.get(f'/export/file/{file_id}/?format=jsonl')
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines()[0], '{"zip":"007","n":"1"}')
+
+    def test_parquet_uses_the_real_header(self):
+        if not pyarrow_available():
+            self.skipTest('pyarrow not installed')
+        file_id = self.upload('p.csv', b',a,a\n0,x,1\n1,y,\n')['file_id']
+        response = self.client.get(f'/export/file/{file_id}/?format=parquet')
+        table = pd.read_parquet(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(list(table.columns), ['Unnamed: 0', 'a', 'a.1'])
+        self.assertEqual(table['a.1'].isna().tolist(), [False, True])
+
+    def test_header_is_sent_before_rows_are_read(self):
+        def chunks():
+            raise AssertionError('read before the header was sent')
+            yield
+        self.assertEqual(next(stream_rows_csv(chunks(), ['k', 'name'])), 'k,name\n')
+
+    def test_negative_offset_or_limit_rejected(self):
+        for query in ('offset=-5', 'limit=-1'):
+            response, _ = self.export(query)
+            self.assertEqual(response.status_code, 400)
+
+
+class ConditionalCachingTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file_id = self.upload('c.csv', b'a,b\n1,2\n3,4\n')['file_id']
+
+    def test_repeat_request_is_not_modified(self):
+        url = f'/get_column_data/?file_id={self.file_id}&column=a'
+        first = self.client.get(url)
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        other = self.client.get(f'/get_column_data/?file_id={self.file_id}&column=b', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(other.status_code, 200)
+
+    def test_last_modified_moves_when_rows_are_appended(self):
+        url = f'/summary/{self.file_id}/'
+        first = self.client.get(url)
+        path = CSVFile.objects.get(id=self.file_id).file.path
+        with open(path, 'a') as fh:
+            fh.write('5,6\n')
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        second = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['summary']['rows'], 3)
+
+    def test_dashboard_has_no_last_modified(self):
+        session_id = CSVFile.objects.get(id=self.file_id).analysissession_set.get().id
+        response = self.client.get(f'/dashboard/{session_id}/')
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_bad_file_id_returns_json_error(self):
+        response = self.client.get('/get_column_data/?file_id=abc&column=a')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['success'])
+
+    def test_missing_stored_file_returns_json_error(self):
+        csv_file = CSVFile.objects.get(id=self.file_id)
+        os.remove(csv_file.file.path)
+        for url in (f'/get_columns/{self.file_id}/', f'/get_column_data/?file_id={self.file_id}&column=a',
+                    f'/summary/{self.file_id}/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertFalse(response.json()['success'])
+
+
+class SummaryTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame({'a': rng.normal(size=200), 'b': rng.normal(size=200), 'label': 'x'})
+        self.df['c'] = self.df['a'] * 2 + rng.normal(size=200) * 0.1
+        self.df.loc[3, 'b'] = np.nan
+        self.file_id = self.upload('s.csv', self.df.to_csv(index=False).encode())['file_id']
+
+    def summary(self, query=''):
+        return self.client.get(f'/summary/{self.file_id}/?{query}').json()['summary']
+
+    def assertMatchesPandas(self, summary, df, method='pearson'):
+        numeric = df[['a', 'b', 'c']]
+        np.testing.assert_allclose(np.array(summary['correlation'], float), numeric.corr(method).values)
+        if method == 'pearson':
+            np.testing.assert_allclose(np.array(summary['covariance'], float), numeric.cov().values)
+        for col in ('a', 'b', 'c'):
+            self.assertAlmostEqual(summary['stats'][col]['std'], numeric[col].std())
+            self.assertEqual(summary['stats'][col]['count'], numeric[col].count())
+
+    def test_matches_pandas(self):
+        self.assertMatchesPandas(self.summary(), self.df)
+        self.assertMatchesPandas(self.summary('method=spearman'), self.df, 'spearman')
+
+    def test_merged_moments_equal_single_pass(self):
+        X = self.df[['a', 'b', 'c']].to_numpy()
+        X[::7, 2] = np.nan
+        merged = _merge_moments(_moments(X[:70]), _moments(X[70:]))
+        whole = _moments(X)
+        for key, value in whole.items():
+            np.testing.assert_allclose(merged[key], value, err_msg=key)
+
+    def test_sparse_column_only_affects_its_own_pairs(self):
+        self.df['b'] = np.nan
+        self.df.loc[[5, 9], 'b'] = [1.0, 2.0]
+        with open(CSVFile.objects.get(id=self.file_id).file.path, 'w') as fh:
+            self.df.to_csv(fh, index=False)
+        for method in ('pearson', 'spearman'):
+            summary = self.summary(f'method={method}')
+            self.assertMatchesPandas(summary, self.df, method)
+        self.assertGreater(summary['correlation'][0][2], 0.99)
+        self.assertEqual(summary['pair_counts'][0][1], 2)
+        self.assertEqual(summary['pair_counts'][0][2], 200)
+
+    def test_state_is_kept_off_the_file_row(self):
+        self.summary()
+        csv_file = CSVFile.objects.get(id=self.file_id)
+        self.assertTrue(os.path.exists(os.path.join(cache_dir(csv_file), 'summary.npz')))
+
+    def test_appended_rows_are_folded_in(self):
+        self.summary()
+        rng = np.random.default_rng(1)
+        extra = pd.DataFrame({'a': rng.normal(size=50), 'b': rng.normal(size=50), 'label': 'y'})
+        extra['c'] = -extra['a']
+        with open(CSVFile.objects.get(id=self.file_id).file.path, 'a') as fh:
+            extra[list(self.df.columns)].to_csv(fh, header=False, index=False)
+
+        full = pd.concat([self.df, extra], ignore_index=True)
+        summary = self.summary()
+        self.assertEqual(summary['rows'], 250)
+        self.assertMatchesPandas(summary, full)
+        self.assertMatchesPandas(self.summary('method=spearman'), full, 'spearman')
+
+    def test_top_k_and_bad_parameters(self):
+        pairs = self.summary('top_k=1')['top_pairs']
+        self.assertEqual((pairs[0]['x'], pairs[0]['y']), ('a', 'c'))
+        response = self.client.get(f'/summary/{self.file_id}/?top_k=z').json()
+        self.assertEqual(response['error'], 'top_k must be an integer')
+
+
+class TimeSeriesTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        body = 'when,amount\n' + ''.join(f'2024-01-{d:02d} 10:00:00,{d}\n' for d in range(1, 29))
+        upload = self.upload('t.csv', body.encode())
+        self.file_id, self.session_id = upload['file_id'], upload['session_id']
+
+    def test_weekly_buckets_are_bounded(self):
+        data = self.client.get(f'/timeseries/{self.file_id}/?column=when&granularity=day&max_buckets=5').json()['data']
+        self.assertEqual(data['granularity'], 'week')
+        self.assertLessEqual(len(data['buckets']), 5)
+        self.assertEqual(sum(data['values']), 28)
+
+    def test_column_cache_removed_when_owner_is_deleted(self):
+        self.client.get(f'/timeseries/{self.file_id}/?column=when')
+        csv_file = CSVFile.objects.get(id=self.file_id)
+        self.assertTrue(os.listdir(cache_dir(csv_file)))
+        self.user.delete()
+        self.assertFalse(os.path.exists(cache_dir(csv_file)))
+
+
+class AnalyzePageTests(MediaTestCase):
+    def test_column_names_cannot_break_out_of_script(self):
+        session_id = self.upload('x.csv', b'"</script><script>alert(1)</script>",b\n1,2\n')['session_id']
+        page = self.client.get(f'/analyze/{session_id}/').content.decode()
+        script = page[page.index('id="column-types"'):]
+        script = script[:script.index('</script>')]
+        self.assertNotIn('<script>alert', script)
+        self.assertIn('\\u003C/script\\u003E', script)
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import shutil
+import warnings
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .caching import ensure_content_hash
+from .csv_reader import read_csv_file
+
+# Coarsest last; 'auto' picks the finest one that fits in max_buckets.
+GRANULARITIES = ('minute', 'hour', 'day', 'week', 'month', 'year')
+AGGREGATIONS = ('count', 'sum', 'mean', 'min', 'max')
+
+DEFAULT_MAX_BUCKETS = 500
+MAX_BUCKETS_LIMIT = 5000
+
+_UNITS = {'minute': 'm', 'hour': 'h', 'day': 'D', 'week': 'D', 'month': 'M', 'year': 'Y'}
+
+# 1970-01-01 was a Thursday; shifting by 3 days makes weeks start on Monday.
+_WEEK_SHIFT = 3
+
+
+def cache_dir(csv_file):
+    return os.path.join(settings.MEDIA_ROOT, 'column_cache', str(csv_file.id))
+
+
+def clear_column_cache(csv_file):
+    shutil.rmtree(cache_dir(csv_file), ignore_errors=True)
+
+
+def _cache_path(csv_file, column, kind):
+    key = hashlib.sha1(f'{ensure_content_hash(csv_file)}\x1f{column}'.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir(csv_file), f'{key}.{kind}.npy')
+
+
+def _cached_column(csv_file, column, kind, convert):
+    """Parse one column once and keep it as a ``.npy`` next to the media files.
+
+    Entries are keyed by content hash, so a changed file never reuses stale
+    values. Later loads are memory-mapped and skip CSV parsing entirely.
+    """
+    path = _cache_path(csv_file, column, kind)
+    if os.path.exists(path):
+        return np.load(path, mmap_mode='r')
+
+    series = read_csv_file(csv_file, usecols=[column])[column]
+    values = convert(series)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp.npy'
+    np.save(tmp, values)
+    os.replace(tmp, path)
+    return values
+
+
+def _to_datetime64(series):
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        with warnings.catch_warnings():
+            # Mixed formats fall back to per-element parsing; that's expected here.
+            warnings.simplefilter('ignore', UserWarning)
+            series = pd.to_datetime(series, errors='coerce', utc=True)
+    if getattr(series.dt, 'tz', None) is not None:
+        series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+    return series.to_numpy(dtype='datetime64[ns]')
+
+
+def _to_float64(series):
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def load_datetime_column(csv_file, column):
+    return _cached_column(csv_file, column, 'datetime64', _to_datetime64)
+
+
+def load_numeric_column(csv_file, column):
+    return _cached_column(csv_file, column, 'float64', _to_float64)
+
+
+def bucket_keys(values, granularity):
+    """Integer bucket index per timestamp, in units of ``granularity``."""
+    keys = values.astype(f'datetime64[{_UNITS[granularity]}]').view(np.int64)
+    if granularity == 'week':
+        keys = (keys + _WEEK_SHIFT) // 7
+    return keys
+
+
+def bucket_labels(first, count, granularity, step=1):
+    keys = first + np.arange(count, dtype=np.int64) * step
+    if granularity == 'week':
+        keys = keys * 7 - _WEEK_SHIFT
+    labels = keys.view(f'datetime64[{_UNITS[granularity]}]')
+    return np.datetime_as_string(labels.astype('datetime64[m]' if granularity in ('minute', 'hour') else 'datetime64[D]')).tolist()
+
+
+def _span(values, granularity):
+    lo, hi = bucket_keys(np.array([values.min(), values.max()]), granularity)
+    return int(hi - lo + 1)
+
+
+def choose_granularity(values, requested, max_buckets):
+    """The requested granularity, or the next coarser one if it would exceed ``max_buckets``."""
+    start = 0 if requested == 'auto' else GRANULARITIES.index(requested)
+    for granularity in GRANULARITIES[start:]:
+        if _span(values, granularity) <= max_buckets:
+            return granularity
+    return GRANULARITIES[-1]
+
+
+def aggregate(idx, size, y=None, agg='count'):
+    """Per-bucket aggregate via bincount/ufunc.at; empty buckets come back as None."""
+    counts = np.bincount(idx, minlength=size)
+    if y is None or agg == 'count':
+        return counts.tolist()
+
+    valid = ~np.isnan(y)
+    idx, y = idx[valid], y[valid]
+    filled = np.bincount(idx, minlength=size)
+
+    if agg in ('sum', 'mean'):
+        out = np.bincount(idx, weights=y, minlength=size)
+        if agg == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out = out / filled
+    else:
+        out = np.full(size, np.inf if agg == 'min' else -np.inf)
+        (np.minimum if agg == 'min' else np.maximum).at(out, idx, y)
+
+    return np.where(filled > 0, out, None).tolist()
+
+
+def build_timeseries(csv_file, column, granularity='auto', y_column=None, agg='count', max_buckets=DEFAULT_MAX_BUCKETS):
+    values = np.asarray(load_datetime_column(csv_file, column))
+    mask = ~np.isnat(values)
+    dropped = int(len(values) - mask.sum())
+    values = values[mask]
+
+    if not len(values):
+        return {'granularity': None, 'buckets': [], 'values': [], 'dropped': dropped}
+
+    granularity = choose_granularity(values, granularity, max_buckets)
+    keys = bucket_keys(values, granularity)
+    first = int(keys.min())
+    span = int(keys.max()) - first + 1
+    # Only reachable when even yearly buckets overflow: merge consecutive years.
+    step = -(-span // max_buckets)
+    idx = (keys - first) // step
+    size = int(idx.max()) + 1
+
+    y = None
+    if y_column and agg != 'count':
+        y = np.asarray(load_numeric_column(csv_file, y_column))[mask]
+
+    return {
+        'granularity': granularity,
+        'start': str(values.min()),
+        'end': str(values.max()),
+        'step': step,
+        'buckets': bucket_labels(first, size, granularity, step),
+        'values': aggregate(idx, size, y, agg),
+        'dropped': dropped,
+    }
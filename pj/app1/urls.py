@@ -11,11 +11,20 @@ urlpatterns = [
     # Core URLs
     path('', views.home, name='home'),
     path('upload/', views.upload_csv, name='upload_csv'),
+    path('upload/bulk/', views.bulk_upload_csv, name='bulk_upload_csv'),
     path('analyze/<int:session_id>/', views.analyze, name='analyze'),
     path('get_column_data/', views.get_column_data, name='get_column_data'),
+    path('get_columns/<int:file_id>/', views.get_columns, name='get_columns'),
+    path('summary/<int:file_id>/', views.get_summary, name='get_summary'),
+    path('timeseries/<int:file_id>/', views.get_timeseries, name='get_timeseries'),
     path('create_chart/', views.create_chart, name='create_chart'),
     path('dashboard/<int:session_id>/', views.dashboard, name='dashboard'),
     
+    # Export URLs
+    path('export/chart/<int:chart_id>/', views.export_chart, name='export_chart'),
+    path('export/session/<int:session_id>/', views.export_session, name='export_session'),
+    path('export/file/<int:file_id>/', views.export_rows, name='export_rows'),
+    
     # Management URLs
     path('my-charts/', views.my_charts, name='my_charts'),
     path('my-files/', views.my_files, name='my_files'),
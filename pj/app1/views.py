@@ -2,8 +2,10 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.views.decorators.http import condition
+from django.views.decorators.cache import cache_control
 from django.contrib import messages
 from django.middleware.csrf import get_token
 from django.db.models import Q
@@ -12,8 +14,12 @@ import json
 import numpy as np
 import os
 from .models import CSVFile, AnalysisSession, Chart
+from .csv_reader import read_csv_file, pyarrow_available
+from . import caching, export
+from .summary import METHODS, build_summary
+from . import timeseries
+from .ingest import infer_column_types, parse_upload, save_upload, create_records, ingest_many, merge_same_schema
 import traceback
-from django.core.files.storage import FileSystemStorage
 
 def signup_view(request):
     if request.user.is_authenticated:
@@ -78,45 +84,21 @@ def upload_csv(request):
         csv_file = request.FILES['csv_file']
         
         try:
-            df = pd.read_csv(csv_file)
+            df, dialect = parse_upload(csv_file)
+            file_hash = caching.content_hash(csv_file)
+            filename = save_upload(request.user, csv_file)
+            column_types = infer_column_types(df)
             
-            fs = FileSystemStorage()
-            filename = fs.save(f'csv_files/{request.user.id}/{csv_file.name}', csv_file)
-            
-            column_types = {}
-            for col in df.columns:
-                dtype = str(df[col].dtype)
-                if 'int' in dtype or 'float' in dtype:
-                    column_types[col] = 'numeric'
-                elif 'object' in dtype:
-                    try:
-                        pd.to_datetime(df[col], errors='raise')
-                        column_types[col] = 'datetime'
-                    except:
-                        unique_count = df[col].nunique()
-                        if unique_count < 20:
-                            column_types[col] = 'categorical'
-                        else:
-                            column_types[col] = 'text'
-                elif 'datetime' in dtype:
-                    column_types[col] = 'datetime'
-                else:
-                    column_types[col] = 'text'
-            
-            csv_record = CSVFile.objects.create(
-                user=request.user,
-                name=csv_file.name,
-                original_filename=csv_file.name,
-                file=filename,
-                size=csv_file.size,
-                rows=len(df),
-                columns=len(df.columns),
-                column_types=column_types
-            )
-            
-            session = AnalysisSession.objects.create(
-                csv_file=csv_record,
-                user=request.user
+            csv_record, session = create_records(
+                request.user,
+                csv_file.name,
+                filename,
+                csv_file.size,
+                len(df),
+                len(df.columns),
+                column_types,
+                dialect,
+                file_hash
             )
             
             sample_data = df.head(15).fillna('').to_dict(orient='records')
@@ -140,6 +122,36 @@ def upload_csv(request):
     return JsonResponse({'success': False, 'error': 'No file uploaded'})
 
 @login_required
+@csrf_exempt
+def bulk_upload_csv(request):
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST only'})
+
+    uploads = request.FILES.getlist('csv_files')
+    if not uploads:
+        return JsonResponse({'success': False, 'error': 'No files uploaded'})
+
+    try:
+        results = ingest_many(request.user, uploads)
+        if not results:
+            return JsonResponse({'success': False, 'error': 'No CSV files found in upload'})
+
+        merged = []
+        if request.POST.get('merge') in ('1', 'true', 'on'):
+            merged = merge_same_schema(request.user, results)
+
+        return JsonResponse({
+            'success': any(r['success'] for r in results),
+            'files': results,
+            'merged': merged,
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.analyze_etag, last_modified_func=caching.analyze_last_modified)
 def analyze(request, session_id):
     try:
         session = get_object_or_404(AnalysisSession, id=session_id, user=request.user)
@@ -158,7 +170,7 @@ def analyze(request, session_id):
             'filename': csv_file.name,
             'rows': csv_file.rows,
             'columns': csv_file.columns,
-            'column_types_json': json.dumps(column_types),
+            'column_types': column_types,
             'csrf_token': get_token(request),
         }
         return render(request, 'analyze.html', context)
@@ -167,6 +179,8 @@ def analyze(request, session_id):
         return HttpResponse(f"Error: {e}")
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.dashboard_etag)
 def dashboard(request, session_id):
     try:
         session = get_object_or_404(AnalysisSession, id=session_id, user=request.user)
@@ -285,12 +299,15 @@ def delete_file(request, file_id):
 @login_required
 @csrf_exempt
 @ensure_csrf_cookie
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.column_data_etag, last_modified_func=caching.column_data_last_modified)
 def get_column_data(request):
-    if request.method != 'POST':
-        return JsonResponse({'success': False, 'error': 'POST only'})
+    if request.method not in ('GET', 'POST'):
+        return JsonResponse({'success': False, 'error': 'GET or POST only'})
 
     try:
-        payload = json.loads(request.body)
+        # GET is preferred so browsers can revalidate with If-None-Match.
+        payload = request.GET if request.method == 'GET' else json.loads(request.body)
         column_name = payload.get('column')
         file_id = payload.get('file_id')
 
@@ -298,7 +315,7 @@ def get_column_data(request):
             return JsonResponse({'success': False, 'error': 'Missing parameters'})
 
         csv_file = get_object_or_404(CSVFile, id=file_id, user=request.user)
-        df = pd.read_csv(csv_file.file.path)
+        df = read_csv_file(csv_file)
 
         if column_name not in df.columns:
             return JsonResponse({'success': False, 'error': 'Column not found'})
@@ -339,10 +356,12 @@ def get_column_data(request):
 
 @login_required
 @csrf_exempt
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.columns_etag, last_modified_func=caching.columns_last_modified)
 def get_columns(request, file_id):
     try:
         csv_file = get_object_or_404(CSVFile, id=file_id, user=request.user)
-        df = pd.read_csv(csv_file.file.path, nrows=0)
+        df = read_csv_file(csv_file, nrows=0)
         columns = list(df.columns)
         
         return JsonResponse({
@@ -354,6 +373,137 @@ def get_columns(request, file_id):
         traceback.print_exc()
         return JsonResponse({'success': False, 'error': str(e)})
 
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.summary_etag, last_modified_func=caching.file_last_modified)
+def get_summary(request, file_id):
+    try:
+        csv_file = get_object_or_404(CSVFile, id=file_id, user=request.user)
+        method = request.GET.get('method', 'pearson')
+        if method not in METHODS:
+            return JsonResponse({'success': False, 'error': 'method must be pearson or spearman'})
+        try:
+            top_k = int(request.GET['top_k']) if request.GET.get('top_k') else None
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'top_k must be an integer'})
+
+        return JsonResponse({'success': True, 'summary': build_summary(csv_file, method, top_k)})
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=caching.timeseries_etag, last_modified_func=caching.file_last_modified)
+def get_timeseries(request, file_id):
+    try:
+        csv_file = get_object_or_404(CSVFile, id=file_id, user=request.user)
+        column = request.GET.get('column')
+        y_column = request.GET.get('y_column') or None
+        granularity = request.GET.get('granularity', 'auto')
+        agg = request.GET.get('agg', 'count' if not y_column else 'sum')
+
+        if csv_file.column_types.get(column) != 'datetime':
+            return JsonResponse({'success': False, 'error': 'Column is not a datetime column'})
+        if y_column and csv_file.column_types.get(y_column) != 'numeric':
+            return JsonResponse({'success': False, 'error': 'y_column must be numeric'})
+        if granularity != 'auto' and granularity not in timeseries.GRANULARITIES:
+            return JsonResponse({'success': False, 'error': 'Unknown granularity'})
+        if agg not in timeseries.AGGREGATIONS:
+            return JsonResponse({'success': False, 'error': 'Unknown aggregation'})
+
+        try:
+            max_buckets = int(request.GET.get('max_buckets', timeseries.DEFAULT_MAX_BUCKETS))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'max_buckets must be an integer'})
+        max_buckets = min(max(max_buckets, 1), timeseries.MAX_BUCKETS_LIMIT)
+
+        data = timeseries.build_timeseries(csv_file, column, granularity, y_column, agg, max_buckets)
+        return JsonResponse({
+            'success': True,
+            'column': column,
+            'y_column': y_column,
+            'agg': agg if y_column else 'count',
+            'data': data,
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({'success': False, 'error': str(e)})
+
 @login_required
 def get_csrf_token(request):
-    return JsonResponse({'csrfToken': get_token(request)})
\ No newline at end of file
+    return JsonResponse({'csrfToken': get_token(request)})
+
+
+def _streaming_download(chunks, fmt, filename):
+    response = StreamingHttpResponse(chunks, content_type=export.CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+@login_required
+def export_chart(request, chart_id):
+    chart = get_object_or_404(Chart, id=chart_id, user=request.user)
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in ('csv', 'jsonl'):
+        return JsonResponse({'success': False, 'error': 'Unsupported format'}, status=400)
+    return _streaming_download(export.stream_chart(chart, fmt), fmt, f'chart-{chart.id}')
+
+@login_required
+def export_session(request, session_id):
+    session = get_object_or_404(AnalysisSession, id=session_id, user=request.user)
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in ('csv', 'jsonl'):
+        return JsonResponse({'success': False, 'error': 'Unsupported format'}, status=400)
+    charts = Chart.objects.filter(session=session, user=request.user).select_related('session__csv_file')
+    return _streaming_download(export.stream_session(charts, fmt), fmt, f'session-{session.id}-charts')
+
+@login_required
+def export_rows(request, file_id):
+    csv_file = get_object_or_404(CSVFile, id=file_id, user=request.user)
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in export.CONTENT_TYPES:
+        return JsonResponse({'success': False, 'error': 'Unsupported format'}, status=400)
+    if fmt == 'parquet' and not pyarrow_available():
+        return JsonResponse({'success': False, 'error': 'Parquet export requires pyarrow'}, status=400)
+
+    try:
+        columns = [c for c in request.GET.get('columns', '').split(',') if c] or None
+        offset = int(request.GET.get('offset', 0))
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'offset and limit must be integers'}, status=400)
+    if offset < 0 or (limit is not None and limit < 0):
+        return JsonResponse({'success': False, 'error': 'offset and limit must not be negative'}, status=400)
+
+    where = None
+    if request.GET.get('filter_column'):
+        filter_column = request.GET['filter_column']
+        filter_value = request.GET.get('filter_value', '')
+        if csv_file.column_types.get(filter_column) == 'numeric':
+            # Numeric columns are matched by value, so 3 matches 3, 3.0 and 3.00.
+            try:
+                filter_value = float(filter_value)
+            except ValueError:
+                return JsonResponse({'success': False, 'error': 'filter_value must be a number'}, status=400)
+        where = (filter_column, filter_value)
+
+    try:
+        known = export.file_columns(csv_file)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+    requested = set(columns or []) | ({where[0]} if where else set())
+    if not requested <= set(known):
+        return JsonResponse({'success': False, 'error': 'Column not found'}, status=400)
+    header = columns or known
+
+    if fmt == 'parquet':
+        schema = export.parquet_schema(csv_file, header)
+        chunks = export.iter_row_chunks(csv_file, columns, offset, limit, where,
+                                        dtype=export.parquet_dtypes(schema), keep_default_na=True)
+        body = export.stream_rows_parquet(chunks, schema)
+    else:
+        chunks = export.iter_row_chunks(csv_file, columns, offset, limit, where)
+        body = export.stream_rows_csv(chunks, header) if fmt == 'csv' else export.stream_rows_jsonl(chunks)
+
+    stem = os.path.splitext(csv_file.name)[0]
+    return _streaming_download(body, fmt, f'{stem}-rows')
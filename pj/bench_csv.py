@@ -0,0 +1,69 @@
+# bench_csv.py
+# Reports CSV parse throughput (MB/s) for every available pandas engine.
+# Usage: python bench_csv.py [path.csv ...]   (defaults to a generated file)
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app1.csv_reader import pyarrow_available, read_csv, sniff_dialect
+
+REPEATS = 3
+
+
+def make_sample(rows=500_000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'value': rng.normal(size=rows),
+        'count': rng.integers(0, 1000, size=rows),
+        'category': rng.choice(['alpha', 'beta', 'gamma', 'delta'], size=rows),
+        'when': pd.date_range('2020-01-01', periods=rows, freq='min').astype(str),
+    })
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    df.to_csv(path, index=False, sep=';')
+    return path
+
+
+def bench(path):
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+
+    start = time.perf_counter()
+    dialect = sniff_dialect(path)
+    sniff_ms = (time.perf_counter() - start) * 1000
+
+    print(f"\n{path} ({size_mb:.1f} MB)")
+    print(f"  sniffed {dialect} in {sniff_ms:.1f} ms")
+
+    engines = ['c', 'python']
+    if pyarrow_available():
+        engines.insert(0, 'pyarrow')
+
+    for engine in engines:
+        best = None
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            df = read_csv(path, dialect=dialect, engine=engine)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"  {engine:<8} {best:7.3f} s  {size_mb / best:8.1f} MB/s  ({len(df)} rows)")
+
+
+if __name__ == '__main__':
+    paths = sys.argv[1:]
+    generated = None
+    if not paths:
+        generated = make_sample()
+        paths = [generated]
+    try:
+        for path in paths:
+            bench(path)
+    finally:
+        if generated:
+            os.remove(generated)
@@ -91,6 +91,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 MAX_UPLOAD_SIZE = 10485760  # 10MB\
+BULK_UPLOAD_WORKERS = 4  # parallel parsers for /upload/bulk/
 
 # Authentication settings
 LOGIN_URL = '/login/'